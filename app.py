@@ -6,8 +6,18 @@ Authentication removed as requested.
 import os
 import csv
 import json
+import atexit
+import hashlib
+import logging
+import logging.handlers
+import queue
+import threading
+from collections import deque
+from itertools import islice
 from datetime import datetime, timezone
+import orjson
 from flask import Flask, request, jsonify, send_from_directory, abort, Response
+from flask.json.provider import JSONProvider
 import time
 
 # ============================
@@ -16,31 +26,377 @@ import time
 CSV_FILE = "bus.csv"
 HOST = "0.0.0.0"
 PORT = 5000
+LOG_LEVEL = "INFO"
+
+# Largest accepted request body; bigger /location posts get 413. The raw
+# body is stored in the CSV, so this also bounds the size of a row.
+MAX_BODY_BYTES = 64 * 1024
+
+# Buffered CSV writes: flush every CSV_FLUSH_INTERVAL seconds or once
+# CSV_BATCH_SIZE rows are waiting, whichever comes first
+CSV_FLUSH_INTERVAL = 0.25
+CSV_BATCH_SIZE = 100
+
+# Number of most recent rows kept in memory for /locations/recent
+MAX_RECENT = 10_000
+
+# Number of devices in the fleet. When set, startup reads bus.csv backwards
+# and stops once every device and the RECENT tail have been seen, instead
+# of scanning the whole log. Leave as None to always scan everything.
+FLEET_SIZE = None
+
+# Seconds an idle SSE connection waits before sending a keep-alive comment
+SSE_KEEPALIVE = 30
+
+# Most /api/stream connections served at once; more get 503. Each open
+# stream holds a server thread, so keep this below the thread count in
+# gunicorn.conf.py or /location posts end up queued behind viewers.
+MAX_STREAMS = 24
+
+# A fix within DEDUP_EPSILON degrees of the device's last stored position,
+# with the same accuracy, arriving less than DEDUP_WINDOW seconds after it,
+# is acknowledged but not stored (parked vehicles repeat the same point)
+DEDUP_EPSILON = 1e-6
+DEDUP_WINDOW = 5
+
+CSV_FIELDS = [
+    "device_id", "latitude", "longitude", "accuracy",
+    "provider", "timestamp_iso", "timestamp_raw",
+    "received_at", "raw_json"
+]
+
+
+class OrjsonProvider(JSONProvider):
+    """Use orjson for request.get_json() and jsonify()."""
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
 
 app = Flask(__name__, static_folder="static")
+app.json = OrjsonProvider(app)
+app.config["MAX_CONTENT_LENGTH"] = MAX_BODY_BYTES
+log = logging.getLogger(__name__)
+
+# Latest row per device_id, kept in sync with the CSV by /location
+LATEST = {}
+LATEST_LOCK = threading.RLock()
+
+# Most recent CSV rows (oldest first), guarded by LATEST_LOCK
+RECENT = deque(maxlen=MAX_RECENT)
+
+# Bumped on every stored location; SSE streams wait on LATEST_CHANGED for it.
+# DEVICE_VERSIONS records the VERSION at which each device last changed.
+VERSION = 0
+DEVICE_VERSIONS = {}
+LATEST_CHANGED = threading.Condition(LATEST_LOCK)
+
+# One slot per open /api/stream connection
+STREAM_SLOTS = threading.BoundedSemaphore(MAX_STREAMS)
+
+# time.monotonic() of the last stored row per device, for de-duplication
+DEVICE_STORED_AT = {}
+
+# Prefixed to VERSION-based ETags so they don't collide across restarts
+BOOT_ID = format(int(time.time()), "x")
+
+# key -> (VERSION, serialized body) for responses rebuilt only on change
+_VERSIONED_BODIES = {}
+
+# Long-lived append handle for CSV_FILE and rows waiting to be written.
+# BUFFER_LOCK only guards BUFFER; WRITER_LOCK serializes the file writes so
+# /location never waits on disk I/O.
+CSV_READY = False
+_CSV_INIT_LOCK = threading.Lock()
+CSV_FH = None
+WRITER = None
+WRITER_LOCK = threading.Lock()
+BUFFER = deque()
+BUFFER_LOCK = threading.Lock()
+_flush_wakeup = threading.Event()
+
+
+# ============================
+# Logging
+# ============================
+def setup_logging():
+    """Route log records through a queue so formatting and stdout writes
+    happen on a background thread instead of in request handlers."""
+    q = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(logging.handlers.QueueHandler(q))
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(q, handler)
+    listener.start()
+    atexit.register(listener.stop)
 
 
 # ============================
 # Initialize CSV
 # ============================
 def init_csv():
+    """Create or load CSV_FILE and start the writer. Safe to call repeatedly;
+    only the first call does any work."""
+    global CSV_READY
+    if CSV_READY:
+        return
+    with _CSV_INIT_LOCK:
+        if not CSV_READY:
+            _init_csv()
+            CSV_READY = True
+
+
+def _init_csv():
     if not os.path.exists(CSV_FILE):
         with open(CSV_FILE, "w", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
-            writer.writerow([
-                "device_id", "latitude", "longitude", "accuracy",
-                "provider", "timestamp_iso", "timestamp_raw",
-                "received_at", "raw_json"
-            ])
+            writer.writerow(CSV_FIELDS)
+    else:
+        if FLEET_SIZE:
+            header, latest, recent = scan_csv_backward()
+        else:
+            header, latest, recent = scan_csv()
+
+        with LATEST_LOCK:
+            RECENT.clear()
+            RECENT.extend(dict(zip(header, values)) for values in recent)
+            LATEST.clear()
+            for device, values in latest.items():
+                LATEST[device] = with_float_coords(dict(zip(header, values)))
+                DEVICE_VERSIONS[device] = VERSION
+
+    start_csv_writer()
+
+
+def scan_csv():
+    """Single forward pass over CSV_FILE.
+
+    Returns (header, latest, recent) where latest maps device_id to its last
+    row and recent holds the last MAX_RECENT rows, oldest first. Rows stay
+    as plain lists from csv.reader; only the ones kept are turned into dicts
+    by the caller. Malformed rows are logged and skipped.
+    """
+    latest = {}
+    recent = deque(maxlen=MAX_RECENT)
+    with open(CSV_FILE, "r", encoding="utf-8", errors="replace") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or CSV_FIELDS
+        dev_idx = header.index("device_id")
+        while True:
+            try:
+                values = next(reader)
+            except StopIteration:
+                break
+            except csv.Error as e:
+                log.warning("[csv] skipped bad row after line %d: %s", reader.line_num, e)
+                continue
+            if not values:
+                continue
+            latest[values[dev_idx] if len(values) > dev_idx else "unknown"] = values
+            recent.append(values)
+    return header, latest, recent
+
+
+def scan_csv_backward():
+    """Like scan_csv(), but reads from the end of the file and stops once
+    FLEET_SIZE devices and MAX_RECENT rows have been found.
+
+    Lines that fail to parse or do not give a full row (e.g. a field
+    containing a raw newline) are skipped.
+    """
+    latest = {}
+    recent = []
+    with open(CSV_FILE, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8", "replace")]), None) or CSV_FIELDS
+        dev_idx = header.index("device_id")
+        for line in read_lines_backward(f, f.tell()):
+            line = line.decode("utf-8", "replace").rstrip("\r")
+            if not line:
+                continue
+            try:
+                values = next(csv.reader([line]))
+            except csv.Error as e:
+                log.warning("[csv] skipped bad row: %s", e)
+                continue
+            if len(values) != len(header):
+                continue
+            if len(recent) < MAX_RECENT:
+                recent.append(values)
+            latest.setdefault(values[dev_idx], values)
+            if len(recent) >= MAX_RECENT and len(latest) >= FLEET_SIZE:
+                break
+    recent.reverse()
+    return header, latest, recent
+
+
+def read_lines_backward(f, start=0, chunk_size=1 << 16):
+    """Yield the lines of binary file `f` after offset `start`, last first."""
+    f.seek(0, os.SEEK_END)
+    pos = f.tell()
+    head = b""
+    while pos > start:
+        size = min(chunk_size, pos - start)
+        pos -= size
+        f.seek(pos)
+        lines = (f.read(size) + head).split(b"\n")
+        # The first piece may be a partial line; finish it with the next chunk
+        head = lines.pop(0)
+        yield from reversed(lines)
+    yield head
+
+
+# ============================
+# Buffered CSV writer
+# ============================
+def start_csv_writer():
+    """Open the shared append handle and start the background flusher."""
+    global CSV_FH, WRITER
+    with WRITER_LOCK:
+        if WRITER is not None:
+            return
+        CSV_FH = open(CSV_FILE, "a", newline="", encoding="utf-8", buffering=1 << 16)
+        WRITER = csv.writer(CSV_FH)
+    threading.Thread(target=_flush_loop, name="csv-flusher", daemon=True).start()
+    atexit.register(flush_csv)
+
+
+def append_csv_row(values):
+    """Queue a row for the flusher; wakes it early once a batch is full."""
+    with BUFFER_LOCK:
+        BUFFER.append(values)
+        full = len(BUFFER) >= CSV_BATCH_SIZE
+    if full:
+        _flush_wakeup.set()
+
+
+def flush_csv():
+    """Write all buffered rows to CSV_FILE.
+
+    If the write fails the batch goes back to the front of BUFFER and the
+    error is re-raised, so rows are retried on the next flush rather than
+    lost (a partially written batch may then appear twice).
+    """
+    with WRITER_LOCK:
+        if WRITER is None:
+            return
+        with BUFFER_LOCK:
+            if not BUFFER:
+                return
+            batch = list(BUFFER)
+            BUFFER.clear()
+        try:
+            WRITER.writerows(batch)
+            CSV_FH.flush()
+        except Exception:
+            with BUFFER_LOCK:
+                BUFFER.extendleft(reversed(batch))
+            raise
+
+
+def _flush_loop():
+    while True:
+        _flush_wakeup.wait(CSV_FLUSH_INTERVAL)
+        _flush_wakeup.clear()
+        try:
+            flush_csv()
+        except Exception as e:
+            log.warning("[csv] flush failed: %s", e)
+
+
+@app.before_request
+def ensure_csv():
+    """Seed the caches on first use when the app was not started via init_app()."""
+    init_csv()
+
+
+# ============================
+# Row helpers
+# ============================
+def csv_row_dict(values):
+    """Build the dict csv.DictReader would return for a freshly written row."""
+    return {
+        field: "" if value is None else str(value)
+        for field, value in zip(CSV_FIELDS, values)
+    }
+
+
+def with_float_coords(row):
+    """Copy of a CSV row with latitude/longitude converted to floats."""
+    row = dict(row)
+    try:
+        row["latitude"] = float(row.get("latitude", 0))
+        row["longitude"] = float(row.get("longitude", 0))
+    except (TypeError, ValueError):
+        row["latitude"] = None
+        row["longitude"] = None
+    return row
+
+
+def fastjson(obj):
+    """JSON response serialized with orjson (for large/hot API payloads)."""
+    return Response(orjson.dumps(obj), mimetype="application/json")
+
+
+def etag_for(body):
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+def cached_json(body, etag, max_age=60):
+    """Serve pre-serialized JSON, answering 304 when If-None-Match matches.
+
+    max_age=None sends no-cache so clients revalidate on every request.
+    """
+    resp = Response(body, mimetype="application/json")
+    resp.set_etag(etag)
+    if max_age is None:
+        resp.cache_control.no_cache = True
+    else:
+        resp.cache_control.public = True
+        resp.cache_control.max_age = max_age
+    return resp.make_conditional(request)
+
+
+def versioned_json(key, build):
+    """Serve build() serialized once per VERSION, with a VERSION ETag.
+
+    build() runs under LATEST_LOCK; between writes every reader gets the
+    same cached bytes.
+    """
+    cached = _VERSIONED_BODIES.get(key)
+    if cached is None or cached[0] != VERSION:
+        with LATEST_LOCK:
+            cached = (VERSION, orjson.dumps(build()))
+        _VERSIONED_BODIES[key] = cached
+    return cached_json(cached[1], f"{BOOT_ID}-{cached[0]}", max_age=None)
 
 
 # ============================
 # Timestamp Parser
 # ============================
+# (unix second, ISO string) of the last formatted "now"; swapped atomically
+_NOW_ISO_CACHE = (0, "")
+
+
+def now_iso():
+    """Current UTC time as ISO-8601, formatted at most once per second."""
+    global _NOW_ISO_CACHE
+    t = int(time.time())
+    cached_t, cached_iso = _NOW_ISO_CACHE
+    if cached_t != t:
+        cached_iso = datetime.fromtimestamp(t, tz=timezone.utc).isoformat()
+        _NOW_ISO_CACHE = (t, cached_iso)
+    return cached_iso
+
+
 def parse_timestamp(data):
     """Supports OwnTracks timestamps."""
     if not isinstance(data, dict):
-        now = datetime.utcnow().replace(tzinfo=timezone.utc).isoformat()
+        now = now_iso()
         return now, None
 
     # ISO timestamp
@@ -54,7 +410,7 @@ def parse_timestamp(data):
         return dt.isoformat(), tst
 
     # fallback
-    now = datetime.utcnow().replace(tzinfo=timezone.utc).isoformat()
+    now = now_iso()
     return now, None
 
 
@@ -63,19 +419,19 @@ def parse_timestamp(data):
 # ============================
 @app.route("/location", methods=["POST"])
 def location():
+    global VERSION
     data = request.get_json(force=True, silent=True)
 
-    print("\n---- NEW /location REQUEST ----")
-    print("Remote addr:", request.remote_addr)
-    print("Headers:", dict(request.headers))
-    print("DEBUG BODY RECEIVED:", data)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("/location from %s headers=%s body=%s",
+                  request.remote_addr, dict(request.headers), data)
 
     if data is None:
         return jsonify({"error": "missing json"}), 400
 
     # Ignore OwnTracks status messages
     if data.get("_type") == "status":
-        print("DEBUG: Ignored status message")
+        log.debug("Ignored status message")
         return jsonify({"status": "ignored"}), 200
 
     # Parse fields (OwnTracks friendly)
@@ -85,6 +441,8 @@ def location():
         data.get("topic") or
         "unknown"
     )
+    # Same key as the CSV row and the seeded caches, whatever the JSON type
+    device_id = str(device_id)
 
     lat = data.get("lat") or data.get("latitude")
     lon = data.get("lon") or data.get("longitude")
@@ -92,28 +450,54 @@ def location():
     accuracy = data.get("accuracy") or data.get("acc") or ""
     provider = data.get("provider") or data.get("t") or data.get("source") or ""
 
-    timestamp_iso, timestamp_raw = parse_timestamp(data)
-    received_at = datetime.utcnow().replace(tzinfo=timezone.utc).isoformat()
-
     # Validate lat/lon
     try:
         lat_val = float(lat)
         lon_val = float(lon)
-    except Exception:
-        print("DEBUG BAD LAT/LON:", lat, lon)
+    except (TypeError, ValueError):
+        log.debug("Bad lat/lon: %r %r", lat, lon)
         return jsonify({"error": "bad lat/lon"}), 400
 
-    # Save to CSV
-    raw_json = json.dumps(data, ensure_ascii=False)
-
-    with open(CSV_FILE, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            device_id, lat_val, lon_val, accuracy, provider,
-            timestamp_iso, timestamp_raw, received_at, raw_json
-        ])
+    # Drop repeats of the last stored fix before paying for the write
+    prev = LATEST.get(device_id)
+    now = time.monotonic()
+    if (
+        prev is not None
+        and prev["latitude"] is not None
+        and abs(prev["latitude"] - lat_val) < DEDUP_EPSILON
+        and abs(prev["longitude"] - lon_val) < DEDUP_EPSILON
+        and prev["accuracy"] == str(accuracy)
+        and now - DEVICE_STORED_AT.get(device_id, float("-inf")) < DEDUP_WINDOW
+    ):
+        log.debug("Duplicate location for %s dropped", device_id)
+        return jsonify({"status": "dedup"}), 200
 
-    print(f"DEBUG: Stored location for {device_id} lat={lat_val} lon={lon_val}")
+    timestamp_iso, timestamp_raw = parse_timestamp(data)
+    received_at = now_iso()
+
+    # Save to CSV, keeping the body as the client sent it. Multi-line
+    # (pretty-printed) bodies are re-encoded so every CSV row stays on one line.
+    raw_json = request.get_data(as_text=True)
+    if "\n" in raw_json or "\r" in raw_json:
+        raw_json = orjson.dumps(data).decode()
+
+    values = [
+        device_id, lat_val, lon_val, accuracy, provider,
+        timestamp_iso, timestamp_raw, received_at, raw_json
+    ]
+    row = csv_row_dict(values)
+    # Queue the CSV row under the same lock as the cache update so the log
+    # and LATEST/RECENT see concurrent posts in the same order
+    with LATEST_CHANGED:
+        append_csv_row(values)
+        RECENT.append(row)
+        LATEST[device_id] = with_float_coords(row)
+        VERSION += 1
+        DEVICE_VERSIONS[device_id] = VERSION
+        DEVICE_STORED_AT[device_id] = now
+        LATEST_CHANGED.notify_all()
+
+    log.debug("Stored location for %s lat=%s lon=%s", device_id, lat_val, lon_val)
     return jsonify({"status": "ok"}), 201
 
 
@@ -122,43 +506,48 @@ def location():
 # ============================
 @app.route("/locations/recent")
 def recent_locations():
-    limit = int(request.args.get("limit", 100))
+    """Return up to `limit` of the most recent rows, oldest first.
 
+    `limit` is clamped to 1..MAX_RECENT.
+    """
     try:
-        with open(CSV_FILE, "r", encoding="utf-8") as f:
-            reader = list(csv.DictReader(f))
-            rows = reader[-limit:]
-    except:
-        rows = []
+        limit = int(request.args.get("limit", 100))
+    except ValueError:
+        return jsonify({"error": "bad limit"}), 400
+    limit = max(1, min(limit, MAX_RECENT))
 
-    return jsonify(rows)
+    with LATEST_LOCK:
+        rows = list(islice(reversed(RECENT), limit))
+    rows.reverse()
+
+    return fastjson(rows)
 
 
 # ============================
 # Helper: Latest locations per device
 # ============================
-def get_latest_locations():
-    """Return a list with the latest row for each device_id."""
-    try:
-        with open(CSV_FILE, "r", encoding="utf-8") as f:
-            reader = list(csv.DictReader(f))
-            latest = {}
-            for row in reader:
-                device = row.get("device_id", "unknown")
-                latest[device] = row
-            # return as list
-            out = []
-            for dev, row in latest.items():
-                try:
-                    row["latitude"] = float(row.get("latitude", 0))
-                    row["longitude"] = float(row.get("longitude", 0))
-                except Exception:
-                    row["latitude"] = None
-                    row["longitude"] = None
-                out.append(row)
-            return out
-    except Exception:
-        return []
+def get_latest_locations(bbox=None):
+    """Return a list with the latest row for each device_id.
+
+    bbox, if given, is (min_lat, max_lat, min_lon, max_lon) and keeps only
+    devices whose latest position falls inside it.
+    """
+    with LATEST_LOCK:
+        if bbox is None:
+            return [dict(row) for row in LATEST.values()]
+        min_lat, max_lat, min_lon, max_lon = bbox
+        return [
+            dict(row) for row in LATEST.values()
+            if row["latitude"] is not None
+            and min_lat <= row["latitude"] <= max_lat
+            and min_lon <= row["longitude"] <= max_lon
+        ]
+
+
+def parse_bbox(value):
+    """Parse a Leaflet toBBoxString() value ("west,south,east,north")."""
+    west, south, east, north = (float(x) for x in value.split(","))
+    return south, north, west, east
 
 
 # ============================
@@ -167,66 +556,104 @@ def get_latest_locations():
 @app.route("/api/vehicles")
 def api_vehicles():
     """Return latest location for all known devices."""
-    limit = int(request.args.get("limit", 0))
-    vehicles = get_latest_locations()
-    if limit and isinstance(limit, int) and limit > 0:
+    if not request.args:
+        # Plain UI refresh: identical until the next /location
+        return versioned_json("vehicles", lambda: list(LATEST.values()))
+
+    try:
+        limit = int(request.args.get("limit", 0))
+    except ValueError:
+        return jsonify({"error": "bad limit"}), 400
+    bbox = None
+    if request.args.get("bbox"):
+        try:
+            bbox = parse_bbox(request.args["bbox"])
+        except ValueError:
+            return jsonify({"error": "bad bbox"}), 400
+    vehicles = get_latest_locations(bbox)
+    if limit > 0:
         vehicles = vehicles[:limit]
-    return jsonify(vehicles)
+    return fastjson(vehicles)
 
 
 @app.route("/api/vehicles/<device_id>")
 def api_vehicle(device_id):
-    vehicles = get_latest_locations()
-    for v in vehicles:
-        if v.get("device_id") == device_id:
-            return jsonify(v)
-    return jsonify({}), 404
+    # Rows in LATEST are replaced on update, never mutated in place
+    v = LATEST.get(device_id)
+    if v is None:
+        return jsonify({}), 404
+    return jsonify(v)
 
 
 # ============================
 # API: routes (static JSON file)
 # ============================
+ROUTES_JSON_BYTES = None
+ROUTES_ETAG = None
+
+
+def load_routes():
+    """Read routes.json once and keep the serialized response body."""
+    global ROUTES_JSON_BYTES, ROUTES_ETAG
+    routes_file = os.path.join(os.path.dirname(__file__), 'routes.json')
+    data = []
+    if os.path.exists(routes_file):
+        try:
+            with open(routes_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning('[routes] error reading routes.json: %s', e)
+    ROUTES_JSON_BYTES = orjson.dumps(data)
+    ROUTES_ETAG = etag_for(ROUTES_JSON_BYTES)
+
+
 @app.route('/api/routes')
 def api_routes():
-    routes_file = os.path.join(os.path.dirname(__file__), 'routes.json')
-    if not os.path.exists(routes_file):
-        return jsonify([])
-    try:
-        with open(routes_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return jsonify(data)
-    except Exception:
-        return jsonify([])
+    if ROUTES_JSON_BYTES is None:
+        load_routes()
+    return cached_json(ROUTES_JSON_BYTES, ROUTES_ETAG)
 
 
 # ============================
 # API: stops (CSV to JSON)
 # ============================
-@app.route('/api/stops')
-def api_stops():
+STOPS_JSON_BYTES = None
+STOPS_ETAG = None
+
+
+def load_stops():
+    """Parse stops.csv once and keep the serialized response body."""
+    global STOPS_JSON_BYTES, STOPS_ETAG
     stops_file = os.path.join(os.path.dirname(__file__), 'stops.csv')
+    out = []
     if not os.path.exists(stops_file):
-        print('[stops] stops.csv not found at', stops_file)
-        return jsonify([])
-    try:
-        with open(stops_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
+        log.warning('[stops] stops.csv not found at %s', stops_file)
+    else:
+        try:
+            with open(stops_file, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    # normalize types
+                    try:
+                        row['lat'] = float(row.get('lat'))
+                        row['lon'] = float(row.get('lon'))
+                    except (TypeError, ValueError):
+                        log.warning('[stops] invalid lat/lon row skipped: %s', row)
+                        continue
+                    row['approximate'] = row.get('approximate') in ('1', 'true', 'True')
+                    out.append(row)
+            log.info('[stops] loaded %d stops', len(out))
+        except (OSError, csv.Error) as e:
+            log.warning('[stops] error reading stops.csv: %s', e)
             out = []
-            for row in reader:
-                # normalize types
-                try:
-                    row['lat'] = float(row.get('lat'))
-                    row['lon'] = float(row.get('lon'))
-                except Exception:
-                    print('[stops] invalid lat/lon row skipped:', row)
-                    continue
-                row['approximate'] = row.get('approximate') in ('1', 'true', 'True')
-                out.append(row)
-            print(f'[stops] served {len(out)} stops')
-            return jsonify(out)
-    except Exception as e:
-        print('[stops] error reading stops.csv:', e)
-        return jsonify([])
+    STOPS_JSON_BYTES = orjson.dumps(out)
+    STOPS_ETAG = etag_for(STOPS_JSON_BYTES)
+
+
+@app.route('/api/stops')
+def api_stops():
+    if STOPS_JSON_BYTES is None:
+        load_stops()
+    return cached_json(STOPS_JSON_BYTES, STOPS_ETAG)
 
 
 # ============================
@@ -234,26 +661,57 @@ def api_stops():
 # ============================
 @app.route('/api/stream')
 def api_stream():
+    if not STREAM_SLOTS.acquire(blocking=False):
+        log.warning("[stream] %d streams open, rejecting new viewer", MAX_STREAMS)
+        return jsonify({"error": "too many streams"}), 503, {"Retry-After": "30"}
+
     def event_stream():
         last_sent = {}
-        # Simple loop; in production consider async/event queue
+        # -1 so the first pass sends every known device
+        last_version = -1
         while True:
-            vehicles = get_latest_locations()
+            with LATEST_CHANGED:
+                if LATEST_CHANGED.wait_for(lambda: VERSION > last_version,
+                                           timeout=SSE_KEEPALIVE):
+                    vehicles = [
+                        LATEST[dev]
+                        for dev, version in DEVICE_VERSIONS.items()
+                        if version > last_version
+                    ]
+                    last_version = VERSION
+                else:
+                    vehicles = None
+
+            if vehicles is None:
+                yield ": keep-alive\n\n"
+                continue
+
+            # Only position fields go out; clients fetch full rows from
+            # /api/vehicles when they need them
             changed = []
             for v in vehicles:
                 dev = v.get('device_id')
                 coords = (v.get('latitude'), v.get('longitude'))
                 if last_sent.get(dev) != coords:
                     last_sent[dev] = coords
-                    changed.append(v)
+                    changed.append({
+                        'device_id': dev,
+                        'latitude': coords[0],
+                        'longitude': coords[1],
+                        'received_at': v.get('received_at'),
+                    })
             if changed:
                 try:
-                    payload = json.dumps(changed, ensure_ascii=False)
+                    payload = orjson.dumps(changed).decode()
                     yield f"data: {payload}\n\n"
                 except Exception:
                     pass
-            time.sleep(1)
-    return Response(event_stream(), mimetype='text/event-stream')
+    # Tell reverse proxies (nginx) not to buffer the stream
+    resp = Response(event_stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Runs when the server closes the response, even if streaming never began
+    resp.call_on_close(STREAM_SLOTS.release)
+    return resp
 
 
 # ============================
@@ -261,26 +719,39 @@ def api_stream():
 # ============================
 @app.route('/api/locations/all')
 def api_locations_all():
-    """Return all location rows from the CSV (could be large)."""
-    try:
-        with open(CSV_FILE, 'r', encoding='utf-8') as f:
-            reader = list(csv.DictReader(f))
-            return jsonify(reader)
-    except Exception:
+    """Stream all location rows from the CSV as a JSON array (could be large)."""
+    flush_csv()
+    if not os.path.exists(CSV_FILE):
         return jsonify([])
 
+    def generate():
+        yield b'['
+        first = True
+        try:
+            with open(CSV_FILE, 'r', encoding='utf-8', errors='replace') as f:
+                reader = csv.DictReader(f)
+                while True:
+                    # A malformed line is skipped instead of ending the stream
+                    try:
+                        row = next(reader)
+                    except StopIteration:
+                        break
+                    except csv.Error as e:
+                        log.warning('[locations] skipped bad CSV row after line %d: %s', reader.line_num, e)
+                        continue
+                    yield (b'' if first else b',') + orjson.dumps(row, option=orjson.OPT_NON_STR_KEYS)
+                    first = False
+        except OSError as e:
+            log.warning('[locations] error streaming CSV: %s', e)
+        yield b']'
+
+    return Response(generate(), mimetype='application/json')
+
 
 @app.route('/api/locations/latest')
 def api_locations_latest():
     """Return the most recent (last) location row from the CSV."""
-    try:
-        with open(CSV_FILE, 'r', encoding='utf-8') as f:
-            reader = list(csv.DictReader(f))
-            if reader:
-                return jsonify(reader[-1])
-            return jsonify({})
-    except Exception:
-        return jsonify({})
+    return versioned_json("latest", lambda: RECENT[-1] if RECENT else {})
 
 
 # ============================
@@ -295,7 +766,15 @@ def static_files(path):
 # ============================
 # Main
 # ============================
-if __name__ == "__main__":
+def init_app():
+    """Load data files and start background threads (dev server and wsgi.py)."""
+    setup_logging()
     init_csv()
-    print(f"Starting server on {HOST}:{PORT} (CSV_FILE={CSV_FILE})")
-    app.run(host=HOST, port=PORT)
+    load_routes()
+    load_stops()
+
+
+if __name__ == "__main__":
+    init_app()
+    log.info("Starting server on %s:%s (CSV_FILE=%s)", HOST, PORT, CSV_FILE)
+    app.run(host=HOST, port=PORT, threaded=True)
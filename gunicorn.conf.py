@@ -0,0 +1,16 @@
+"""
+Gunicorn settings for the tracking server (`gunicorn wsgi:app`).
+
+The app keeps its caches, SSE subscribers and the CSV writer in process
+memory, so it must run as a single worker process. Concurrency comes from
+threads: each open /api/stream connection holds one thread while it waits
+for updates. app.MAX_STREAMS caps those connections below `threads` so
+some threads stay free for /location posts and API reads; raise both
+together if you need more map viewers.
+"""
+
+bind = "0.0.0.0:5000"
+workers = 1
+worker_class = "gthread"
+threads = 32
+keepalive = 75
@@ -0,0 +1,11 @@
+"""
+WSGI entry point for production servers, e.g.:
+
+    gunicorn wsgi:app
+
+Settings live in gunicorn.conf.py.
+"""
+
+from app import app, init_app
+
+init_app()